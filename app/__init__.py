@@ -18,6 +18,11 @@ from flask_sslify import SSLify # Para forçar HTTPS em produção
 from flask_jwt_extended import JWTManager  # Para autenticação JWT
 
 from werkzeug.serving import WSGIRequestHandler
+from .logger import init_request_logging, parse_route_sample_rates
+from .profiling import init_profiling
+from .admission import AdmissionController
+from .ratelimit import SlidingWindowStorage  # noqa: F401 - regista o esquema sliding://
+from .database import READ_PREFERENCES, COMPRESSORS, COMPRESSOR_PACKAGES, compressor_available, parse_compressors
 
 def validate_env_variables() -> Dict[str, Any]:
     """
@@ -57,25 +62,217 @@ def validate_env_variables() -> Dict[str, Any]:
         }
     }
     
+    # Define as variáveis opcionais e os seus valores por defeito
+    optional_vars = {
+        'LOG_LEVEL': {
+            'type': str,
+            'default': 'INFO',
+            'validator': lambda x: x.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+            'error': 'LOG_LEVEL deve ser DEBUG, INFO, WARNING, ERROR ou CRITICAL'
+        },
+        'LOG_QUEUE_SIZE': {
+            'type': int,
+            'default': 10000,
+            'validator': lambda x: x > 0,
+            'error': 'LOG_QUEUE_SIZE deve ser maior que 0'
+        },
+        'LOG_SAMPLE_RATE': {
+            'type': float,
+            'default': 1.0,
+            'validator': lambda x: 0.0 <= x <= 1.0,
+            'error': 'LOG_SAMPLE_RATE deve estar entre 0 e 1'
+        },
+        'LOG_ROUTE_SAMPLE_RATES': {
+            'type': str,
+            'default': '',
+            'validator': lambda x: all(
+                '=' in item and 0.0 <= float(item.split('=', 1)[1]) <= 1.0
+                for item in x.split(',') if item.strip()
+            ),
+            'error': 'LOG_ROUTE_SAMPLE_RATES deve ter o formato "endpoint=taxa,endpoint=taxa"'
+        },
+        'PROFILE_TOKEN': {
+            'type': str,
+            'default': '',
+            'validator': lambda x: len(x) == 0 or len(x) >= 32,
+            'error': 'PROFILE_TOKEN deve ter pelo menos 32 caracteres'
+        },
+        'PROFILE_SAMPLE_RATE': {
+            'type': float,
+            'default': 0.0,
+            'validator': lambda x: 0.0 <= x <= 1.0,
+            'error': 'PROFILE_SAMPLE_RATE deve estar entre 0 e 1'
+        },
+        'PROFILE_DIR': {
+            'type': str,
+            'default': 'profiles',
+            'validator': lambda x: len(x) > 0,
+            'error': 'PROFILE_DIR não pode estar vazio'
+        },
+        'PROFILE_MAX_FILES': {
+            'type': int,
+            'default': 100,
+            'validator': lambda x: x >= 0,
+            'error': 'PROFILE_MAX_FILES não pode ser negativo'
+        },
+        'ADMISSION_AUTH_CONCURRENCY': {
+            'type': int,
+            'default': 8,
+            'validator': lambda x: x > 0,
+            'error': 'ADMISSION_AUTH_CONCURRENCY deve ser maior que 0'
+        },
+        'ADMISSION_AUTH_QUEUE': {
+            'type': int,
+            'default': 16,
+            'validator': lambda x: x >= 0,
+            'error': 'ADMISSION_AUTH_QUEUE não pode ser negativo'
+        },
+        'ADMISSION_READ_CONCURRENCY': {
+            'type': int,
+            'default': 32,
+            'validator': lambda x: x > 0,
+            'error': 'ADMISSION_READ_CONCURRENCY deve ser maior que 0'
+        },
+        'ADMISSION_READ_QUEUE': {
+            'type': int,
+            'default': 64,
+            'validator': lambda x: x >= 0,
+            'error': 'ADMISSION_READ_QUEUE não pode ser negativo'
+        },
+        'ADMISSION_QUEUE_TIMEOUT_MS': {
+            'type': int,
+            'default': 500,
+            'validator': lambda x: 0 <= x <= 2500,
+            'error': 'ADMISSION_QUEUE_TIMEOUT_MS deve estar entre 0 e 2500'
+        },
+        'ADMISSION_RETRY_AFTER': {
+            'type': int,
+            'default': 1,
+            'validator': lambda x: x > 0,
+            'error': 'ADMISSION_RETRY_AFTER deve ser maior que 0'
+        },
+        'RATELIMIT_MAX_KEYS': {
+            'type': int,
+            'default': 10000,
+            'validator': lambda x: x > 0,
+            'error': 'RATELIMIT_MAX_KEYS deve ser maior que 0'
+        },
+        'IDEMPOTENCY_TTL': {
+            'type': int,
+            'default': 86400,
+            'validator': lambda x: x > 0,
+            'error': 'IDEMPOTENCY_TTL deve ser maior que 0'
+        },
+        'IDEMPOTENCY_CACHE_SIZE': {
+            'type': int,
+            'default': 1024,
+            'validator': lambda x: x >= 0,
+            'error': 'IDEMPOTENCY_CACHE_SIZE não pode ser negativo'
+        },
+        'IDEMPOTENCY_LEASE': {
+            'type': int,
+            'default': 30,
+            'validator': lambda x: x > 0,
+            'error': 'IDEMPOTENCY_LEASE deve ser maior que 0'
+        },
+        'AUDIT_TTL_DAYS': {
+            'type': int,
+            'default': 90,
+            'validator': lambda x: x > 0,
+            'error': 'AUDIT_TTL_DAYS deve ser maior que 0'
+        },
+        'AUDIT_BATCH_SIZE': {
+            'type': int,
+            'default': 100,
+            'validator': lambda x: 0 < x <= 10000,
+            'error': 'AUDIT_BATCH_SIZE deve estar entre 1 e 10000'
+        },
+        'AUDIT_FLUSH_INTERVAL_MS': {
+            'type': int,
+            'default': 2000,
+            'validator': lambda x: x > 0,
+            'error': 'AUDIT_FLUSH_INTERVAL_MS deve ser maior que 0'
+        },
+        'AUDIT_QUEUE_SIZE': {
+            'type': int,
+            'default': 10000,
+            'validator': lambda x: x > 0,
+            'error': 'AUDIT_QUEUE_SIZE deve ser maior que 0'
+        },
+        'MONGO_DB_NAME': {
+            'type': str,
+            'default': 'Cluster0',
+            'validator': lambda x: len(x) > 0,
+            'error': 'MONGO_DB_NAME não pode estar vazio'
+        },
+        'MONGO_PRIMARY_POOL_SIZE': {
+            'type': int,
+            'default': 50,
+            'validator': lambda x: x > 0,
+            'error': 'MONGO_PRIMARY_POOL_SIZE deve ser maior que 0'
+        },
+        'MONGO_READS_POOL_SIZE': {
+            'type': int,
+            'default': 50,
+            'validator': lambda x: x > 0,
+            'error': 'MONGO_READS_POOL_SIZE deve ser maior que 0'
+        },
+        'MONGO_READS_PREFERENCE': {
+            'type': str,
+            'default': 'secondaryPreferred',
+            'validator': lambda x: x in READ_PREFERENCES,
+            'error': f'MONGO_READS_PREFERENCE deve ser um de: {", ".join(READ_PREFERENCES)}'
+        },
+        'MONGO_READS_MAX_STALENESS': {
+            'type': int,
+            'default': 120,
+            'validator': lambda x: x == -1 or x >= 90,
+            'error': 'MONGO_READS_MAX_STALENESS deve ser -1 (sem limite) ou pelo menos 90 segundos'
+        },
+        'MONGO_COMPRESSORS': {
+            'type': str,
+            'default': '',
+            'validator': lambda x: all(compressor_available(c) for c in parse_compressors(x)),
+            'error': (f'MONGO_COMPRESSORS deve conter apenas: {", ".join(COMPRESSORS)}, '
+                      f'com o respetivo pacote instalado '
+                      f'({", ".join(f"{c}: {p}" for c, p in COMPRESSOR_PACKAGES.items())})')
+        },
+        'MONGO_WRITE_CONCERN': {
+            'type': str,
+            'default': '',
+            'validator': lambda x: x == '' or x == 'majority' or x.isdigit(),
+            'error': 'MONGO_WRITE_CONCERN deve ser "majority" ou um número'
+        }
+    }
+    
     validated_vars = {}
     
-    for var_name, config in required_vars.items():
+    for var_name, config in {**required_vars, **optional_vars}.items():
         # Verifica se a variável existe
         value = os.getenv(var_name)
         if value is None:
-            raise ValueError(f'Variável de ambiente {var_name} não encontrada')
+            if 'default' not in config:
+                raise ValueError(f'Variável de ambiente {var_name} não encontrada')
+            validated_vars[var_name] = config['default']
+            continue
             
         # Converte para o tipo correto
         try:
             if config['type'] is int:
                 value = int(value)
+            elif config['type'] is float:
+                value = float(value)
             elif config['type'] is bool and isinstance(value, str):
                 value = value.lower() == 'true'
         except ValueError:
             raise ValueError(f'Variável {var_name} tem tipo inválido. Esperado: {config["type"].__name__}')
             
         # Aplica validação específica
-        if not config['validator'](value):
+        try:
+            valid = config['validator'](value)
+        except ValueError:
+            valid = False
+        if not valid:
             raise ValueError(config['error'])
             
         validated_vars[var_name] = value
@@ -125,6 +322,22 @@ jwt = JWTManager(api)
 api.config["JWT_SECRET_KEY"] = env_vars["JWT_SECRET_KEY"]  # Chave secreta para tokens
 api.config["JWT_ACCESS_TOKEN_EXPIRES"] = datetime.timedelta(minutes=7)  # Tempo de expiração do token
 
+# Identificador e amostragem de logs por pedido
+init_request_logging(
+    api,
+    sample_rate=env_vars["LOG_SAMPLE_RATE"],
+    route_sample_rates=parse_route_sample_rates(env_vars["LOG_ROUTE_SAMPLE_RATES"])
+)
+
+# Profiling opcional por pedido (header de administração ou amostragem)
+init_profiling(
+    api,
+    token=env_vars["PROFILE_TOKEN"],
+    sample_rate=env_vars["PROFILE_SAMPLE_RATE"],
+    output_dir=env_vars["PROFILE_DIR"],
+    max_files=env_vars["PROFILE_MAX_FILES"]
+)
+
 # Middleware para adicionar cabeçalhos de segurança
 @api.after_request
 def add_security_headers(response):
@@ -148,13 +361,37 @@ def add_security_headers(response):
     
     return response
 
+# Controlo de admissão à frente do pool de ligações MongoDB
+# Cada grupo de rotas tem o seu orçamento de concorrência e uma fila limitada;
+# quando saturado responde de imediato com 503 e Retry-After
+admission = AdmissionController(retry_after=env_vars["ADMISSION_RETRY_AFTER"])
+admission.add_pool(
+    "auth",  # Rotas com bcrypt (login e criação de utilizadores)
+    max_concurrent=env_vars["ADMISSION_AUTH_CONCURRENCY"],
+    max_queue=env_vars["ADMISSION_AUTH_QUEUE"],
+    queue_timeout=env_vars["ADMISSION_QUEUE_TIMEOUT_MS"] / 1000
+)
+admission.add_pool(
+    "read",  # Rotas de leitura
+    max_concurrent=env_vars["ADMISSION_READ_CONCURRENCY"],
+    max_queue=env_vars["ADMISSION_READ_QUEUE"],
+    queue_timeout=env_vars["ADMISSION_QUEUE_TIMEOUT_MS"] / 1000
+)
+# Registado antes do limitador: os hooks after_request correm por ordem inversa,
+# pelo que o Retry-After das respostas 503 é aplicado depois do do limitador
+admission.init_app(api)
+
 # Configuração do limitador de requisições
 # Previne abusos limitando o número de requisições por IP
 limiter = Limiter(
     key_func=get_remote_address,  # Usa o IP como identificador
-    storage_uri="memory://",  # Armazena contadores na memória
+    storage_uri="sliding://",  # Janelas deslizantes em memória (app/ratelimit.py)
+    storage_options={
+        "max_keys": env_vars["RATELIMIT_MAX_KEYS"],  # Limite de chaves em memória (LRU)
+        "buckets": 10  # Precisão da janela: 1/10 da duração de cada limite
+    },
     default_limits=["100 per day", "30 per hour", "5 per minute"],  # Limites padrão globais
-    strategy="fixed-window-elastic-expiry",  # Estratégia mais robusta para contagem
+    strategy="moving-window",  # Janela deslizante, sem rajadas nas fronteiras das janelas
     headers_enabled=True,  # Habilita headers de rate limit na resposta
     swallow_errors=True,  # Continua funcionando mesmo se houver erros no storage
     retry_after="http-date"  # Formato do header Retry-After
@@ -0,0 +1,102 @@
+# Importações do sistema
+import logging
+import threading
+from functools import wraps
+from typing import Dict
+
+# Semáforo compatível com o servidor gevent (não bloqueia o hub enquanto espera)
+from gevent.lock import BoundedSemaphore
+
+# Importações do Flask
+from flask import Flask, g
+
+from app.utils import response
+
+
+class AdmissionPool:
+    """
+    Orçamento de concorrência para um grupo de rotas.
+    Até max_concurrent pedidos executam ao mesmo tempo; até max_queue
+    esperam no máximo queue_timeout segundos; os restantes são rejeitados.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = BoundedSemaphore(max_concurrent)
+        self._counters_lock = threading.Lock()
+        self.waiting = 0
+        self.rejected = 0
+
+    def acquire(self) -> bool:
+        """Tenta admitir um pedido. Retorna False se o pedido deve ser rejeitado."""
+        if self._semaphore.acquire(blocking=False):
+            return True
+
+        # Fila cheia: rejeita de imediato em vez de acumular pedidos
+        with self._counters_lock:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+
+        try:
+            admitted = self._semaphore.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._counters_lock:
+                self.waiting -= 1
+
+        if not admitted:
+            with self._counters_lock:
+                self.rejected += 1
+        return admitted
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+
+class AdmissionController:
+    """Conjunto de orçamentos de concorrência, aplicados às rotas com um decorador."""
+
+    def __init__(self, retry_after: int = 1):
+        self.retry_after = retry_after
+        self.pools: Dict[str, AdmissionPool] = {}
+
+    def init_app(self, app: Flask) -> None:
+        """
+        Regista o hook que define o Retry-After das respostas rejeitadas.
+        Deve ser chamado antes de limiter.init_app(): o Flask-Limiter reescreve
+        o Retry-After com o fim da janela de rate limit, e os hooks after_request
+        registados primeiro são executados por último.
+        """
+        @app.after_request
+        def add_retry_after_header(response):
+            if g.get("admission_rejected"):
+                response.headers["Retry-After"] = str(self.retry_after)
+            return response
+
+    def add_pool(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float) -> None:
+        self.pools[name] = AdmissionPool(name, max_concurrent, max_queue, queue_timeout)
+
+    def limit(self, pool_name: str):
+        """Decorador que só executa a rota se houver capacidade no orçamento indicado."""
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                pool = self.pools[pool_name]
+                if not pool.acquire():
+                    logging.warning(f"Pedido rejeitado por sobrecarga (orçamento '{pool_name}')")
+                    g.admission_rejected = True  # O header Retry-After é aplicado no after_request
+                    return response(
+                        {"error": "overloaded", "retry_after": self.retry_after},
+                        "Serviço sobrecarregado. Por favor, tente novamente mais tarde.",
+                        503
+                    )
+                try:
+                    return f(*args, **kwargs)
+                finally:
+                    pool.release()
+            return decorated_function
+        return decorator
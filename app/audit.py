@@ -0,0 +1,165 @@
+# Importações do sistema
+import atexit
+import datetime
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Importações do MongoDB
+from pymongo.collection import Collection
+
+from app.database import ensure_ttl_index
+
+# Resultados possíveis de uma tentativa de login
+OUTCOME_SUCCESS = "success"
+OUTCOME_FAILURE = "failure"
+OUTCOME_BLOCKED = "blocked"
+
+# Intervalo mínimo entre avisos de eventos descartados
+DROPPED_WARNING_INTERVAL = 10.0
+
+
+class LoginAuditor:
+    """
+    Registo de auditoria das tentativas de login.
+    Os eventos ficam numa fila em memória e uma thread em segundo plano
+    grava-os em lote com insert_many, quando o lote atinge batch_size ou
+    passam flush_interval segundos. Com a fila cheia os eventos são
+    descartados e contabilizados, para nunca atrasar o login; o primeiro
+    descarte gera um WARNING, repetido no máximo a cada
+    DROPPED_WARNING_INTERVAL segundos enquanto a fila estiver cheia.
+
+    Com o gevent monkey-patched (run.py em produção) a thread de gravação é
+    um greenlet: o insert_many usa os sockets do gevent e cede o hub enquanto
+    espera pelo MongoDB. Não pode correr numa thread real, porque as ligações
+    do pool do pymongo pertencem ao hub da thread principal.
+    """
+
+    def __init__(self, collection: Collection, ttl: int = 7776000, batch_size: int = 100,
+                 flush_interval: float = 2.0, max_queue: int = 10000):
+        self.collection = collection
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._index_ready = False
+        # Os contadores são alterados pelos pedidos e pela thread de gravação
+        self._counters_lock = threading.Lock()
+        self._last_drop_warning = float("-inf")
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """Inicia a thread de gravação (chamado automaticamente no primeiro evento)."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="login-audit", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Grava os eventos pendentes e termina a thread."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        logging.info(f"Auditoria de login terminada: {self.stats()}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._counters_lock:
+            return {
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "flushed": self.flushed,
+                "failed": self.failed,
+                "pending": self._queue.qsize(),
+            }
+
+    def record(self, ip: str, email: str, outcome: str) -> None:
+        """Coloca um evento na fila sem bloquear."""
+        if self._thread is None:
+            self.start()
+        event = {
+            "ip": ip,
+            "email": email,
+            "outcome": outcome,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc),
+        }
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._record_dropped()
+            return
+        with self._counters_lock:
+            self.enqueued += 1
+
+    def _record_dropped(self) -> None:
+        now = time.monotonic()
+        with self._counters_lock:
+            self.dropped += 1
+            dropped = self.dropped
+            warn = now - self._last_drop_warning >= DROPPED_WARNING_INTERVAL
+            if warn:
+                self._last_drop_warning = now
+        if warn:
+            logging.warning(f"Fila da auditoria de login cheia: eventos descartados (total: {dropped})")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+        # Encerramento: grava tudo o que ficou na fila
+        batch = self._drain()
+        while batch:
+            self._flush(batch)
+            batch = self._drain()
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        """Espera por eventos até encher um lote ou esgotar o intervalo."""
+        batch: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, 0.5)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        batch: List[Dict[str, Any]] = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        if not self._index_ready:
+            # Uma falha no índice não impede a gravação do lote; tenta de novo no próximo
+            try:
+                ensure_ttl_index(self.collection, "timestamp", self.ttl)
+                self._index_ready = True
+            except Exception as err:
+                logging.warning(f"Falha ao criar o índice TTL da auditoria de login: {err}")
+        try:
+            self.collection.insert_many(batch, ordered=False)
+            with self._counters_lock:
+                self.flushed += len(batch)
+        except Exception as err:
+            with self._counters_lock:
+                self.failed += len(batch)
+            logging.warning(f"Falha ao gravar {len(batch)} eventos de auditoria de login: {err}")
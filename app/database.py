@@ -0,0 +1,124 @@
+# Importações do sistema
+import importlib.util
+import logging
+from typing import Any, Dict, List
+
+# Importações do MongoDB
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import OperationFailure
+from pymongo.mongo_client import MongoClient
+
+# Perfis de cliente disponíveis
+PROFILE_PRIMARY = "primary"  # Escritas e leituras que exigem dados atuais (login)
+PROFILE_READS = "reads"      # Leituras pesadas que toleram atraso (listagens, estatísticas)
+
+# Valores aceites nas variáveis de ambiente
+READ_PREFERENCES = ['primary', 'primaryPreferred', 'secondary', 'secondaryPreferred', 'nearest']
+COMPRESSORS = ['zstd', 'snappy', 'zlib']
+
+# Módulo Python de que o pymongo precisa para cada compressor. zlib faz parte da
+# biblioteca padrão e zstandard está no requirements.txt; o snappy é opcional,
+# porque o python-snappy precisa da biblioteca nativa, e é verificado no arranque
+COMPRESSOR_MODULES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': 'zlib'}
+COMPRESSOR_PACKAGES = {'zstd': 'zstandard', 'snappy': 'python-snappy'}
+
+
+def parse_compressors(value: str) -> List[str]:
+    """Converte a lista separada por vírgulas em nomes sem espaços."""
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def compressor_available(name: str) -> bool:
+    """Indica se o compressor é conhecido e o seu módulo está instalado."""
+    module = COMPRESSOR_MODULES.get(name)
+    return module is not None and importlib.util.find_spec(module) is not None
+
+
+def profiles_from_env(env_vars: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Constrói as opções do MongoClient de cada perfil a partir das variáveis validadas.
+    As opções comuns (compressão, write concern, timeouts) aplicam-se a todos os perfis.
+    """
+    common: Dict[str, Any] = {
+        "waitQueueTimeoutMS": 2500,
+        "serverSelectionTimeoutMS": 5000,
+    }
+    if env_vars["MONGO_COMPRESSORS"]:
+        # Sem espaços: o pymongo ignoraria " snappy" com um aviso e sem compressão
+        common["compressors"] = parse_compressors(env_vars["MONGO_COMPRESSORS"])
+    write_concern = env_vars["MONGO_WRITE_CONCERN"]
+    if write_concern:
+        common["w"] = int(write_concern) if write_concern.isdigit() else write_concern
+
+    reads: Dict[str, Any] = {
+        **common,
+        "maxPoolSize": env_vars["MONGO_READS_POOL_SIZE"],
+        "readPreference": env_vars["MONGO_READS_PREFERENCE"],
+    }
+    # maxStalenessSeconds não é permitido com readPreference=primary
+    if env_vars["MONGO_READS_PREFERENCE"] != 'primary' and env_vars["MONGO_READS_MAX_STALENESS"] != -1:
+        reads["maxStalenessSeconds"] = env_vars["MONGO_READS_MAX_STALENESS"]
+
+    return {
+        PROFILE_PRIMARY: {
+            **common,
+            "maxPoolSize": env_vars["MONGO_PRIMARY_POOL_SIZE"],
+            "readPreference": "primary",
+        },
+        PROFILE_READS: reads,
+    }
+
+
+# Códigos de erro do MongoDB quando já existe um índice com opções diferentes
+INDEX_CONFLICT_CODES = (85, 86)  # IndexOptionsConflict, IndexKeySpecsConflict
+
+
+def ensure_ttl_index(collection: Collection, field: str, ttl: int) -> None:
+    """
+    Garante um índice TTL em field com expireAfterSeconds=ttl.
+    Se o índice já existir com outro TTL (ex.: a variável de ambiente mudou),
+    o TTL é atualizado com collMod em vez de falhar; se não for possível,
+    o índice existente continua a ser usado.
+    """
+    try:
+        collection.create_index(field, expireAfterSeconds=ttl)
+    except OperationFailure as err:
+        if err.code not in INDEX_CONFLICT_CODES:
+            raise
+        try:
+            collection.database.command(
+                "collMod", collection.name,
+                index={"keyPattern": {field: 1}, "expireAfterSeconds": ttl}
+            )
+        except OperationFailure as mod_err:
+            logging.warning(f"Não foi possível alterar o TTL de {collection.name}.{field}: {mod_err}")
+
+
+class MongoProfiles:
+    """
+    Um MongoClient por perfil, cada um com o seu pool, read preference e
+    write concern. Os clientes são criados na primeira utilização.
+    """
+
+    def __init__(self, uri: str, db_name: str, profiles: Dict[str, Dict[str, Any]]):
+        self.uri = uri
+        self.db_name = db_name
+        self.profiles = profiles
+        self._clients: Dict[str, MongoClient] = {}
+
+    def client(self, profile: str = PROFILE_PRIMARY) -> MongoClient:
+        if profile not in self._clients:
+            self._clients[profile] = MongoClient(self.uri, **self.profiles[profile])
+        return self._clients[profile]
+
+    def database(self, profile: str = PROFILE_PRIMARY) -> Database:
+        return self.client(profile)[self.db_name]
+
+    def collection(self, name: str, profile: str = PROFILE_PRIMARY) -> Collection:
+        return self.database(profile)[name]
+
+    def close(self) -> None:
+        for client in self._clients.values():
+            client.close()
+        self._clients.clear()
@@ -0,0 +1,210 @@
+# Importações do sistema
+import datetime
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Dict, Optional
+
+# Importações do Flask e extensões
+from flask import current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+# Importações do MongoDB
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+
+from app.database import ensure_ttl_index
+from app.utils import deserialize, response, serialize
+
+# Header enviado pelo cliente para identificar um pedido repetível
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# Header acrescentado às respostas repetidas a partir do armazenamento
+REPLAYED_HEADER = "Idempotent-Replayed"
+# Chaves aceites: até 255 caracteres visíveis
+KEY_PATTERN = re.compile(r'^[\x21-\x7e]{1,255}$')
+
+
+class IdempotencyStore:
+    """
+    Guarda a primeira resposta de cada Idempotency-Key numa coleção MongoDB
+    com índice TTL, com uma cache em memória para as chaves mais recentes.
+    Um pedido repetido com a mesma chave recebe a resposta guardada, sem
+    voltar a executar a rota (hash bcrypt, consultas e inserções).
+    Enquanto um pedido é processado a chave fica reservada por lease
+    segundos; se o processo terminar sem libertar a reserva, uma repetição
+    após esse prazo assume-a.
+    """
+
+    def __init__(self, collection: Collection, ttl: int = 86400, cache_size: int = 1024,
+                 lease: int = 30):
+        self.collection = collection
+        self.ttl = ttl
+        self.lease = lease
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._index_ready = False
+
+    def _ensure_index(self) -> None:
+        """Cria o índice TTL na primeira utilização."""
+        if self._index_ready:
+            return
+        ensure_ttl_index(self.collection, "created_at", self.ttl)
+        self._index_ready = True
+
+    def _cache_get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._cache.get(doc_id)
+            if entry is None:
+                return None
+            if entry["expires_at"] <= time.monotonic():
+                del self._cache[doc_id]
+                return None
+            self._cache.move_to_end(doc_id)
+            return entry
+
+    def _cache_put(self, doc_id: str, doc: Dict[str, Any]) -> None:
+        with self._lock:
+            self._cache[doc_id] = {**doc, "expires_at": time.monotonic() + self.ttl}
+            self._cache.move_to_end(doc_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _document_id(key: str) -> str:
+        """A chave é válida apenas para a mesma rota e o mesmo utilizador (ou IP)."""
+        try:
+            identity = get_jwt_identity()
+        except RuntimeError:
+            identity = None
+        scope = f"{request.endpoint}:{identity or request.remote_addr}:{key}"
+        return hashlib.sha256(scope.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _replay(doc: Dict[str, Any]):
+        """Repete a resposta guardada, no formato pedido pelo header Accept desta repetição."""
+        if doc.get("payload") is not None:
+            stored = serialize(doc["payload"])
+            stored.status_code = doc["code"]
+        else:
+            stored = current_app.response_class(doc["body"], status=doc["code"], mimetype=doc["mimetype"])
+        stored.headers[REPLAYED_HEADER] = "true"
+        return stored
+
+    def _claim(self, doc_id: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Reserva a chave para este pedido.
+        Retorna None se a reserva foi obtida, ou o documento existente
+        (resposta guardada ou reserva ainda válida de outro pedido).
+        """
+        self._ensure_index()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        locked_until = now + datetime.timedelta(seconds=self.lease)
+        try:
+            self.collection.insert_one({
+                "_id": doc_id,
+                "fingerprint": fingerprint,
+                "status": "processing",
+                "locked_until": locked_until,
+                "created_at": now
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        # Assume atomicamente uma reserva abandonada (lease expirado) do mesmo pedido
+        taken = self.collection.find_one_and_update(
+            {
+                "_id": doc_id,
+                "fingerprint": fingerprint,
+                "status": "processing",
+                "$or": [
+                    {"locked_until": {"$lt": now}},
+                    {"locked_until": {"$exists": False}}
+                ]
+            },
+            {"$set": {"locked_until": locked_until}}
+        )
+        if taken is not None:
+            logging.info("Reserva de Idempotency-Key expirada assumida por nova tentativa")
+            return None
+
+        doc = self.collection.find_one({"_id": doc_id})
+        if doc is None:
+            # A reserva expirou pelo TTL entretanto: tenta de novo
+            return self._claim(doc_id, fingerprint)
+        return doc
+
+    def idempotent(self, f):
+        """Decorador que ativa o suporte ao header Idempotency-Key numa rota POST."""
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if key is None:
+                return f(*args, **kwargs)
+            if not KEY_PATTERN.match(key):
+                return response(key, "Idempotency-Key inválida", 400)
+
+            doc_id = self._document_id(key)
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+            # Cache em memória: repete a resposta sem aceder à base de dados
+            cached = self._cache_get(doc_id)
+            if cached is not None:
+                if cached["fingerprint"] != fingerprint:
+                    return response(key, "Idempotency-Key já usada com outro pedido", 422)
+                return self._replay(cached)
+
+            # Reserva a chave; se já existir, o pedido é uma repetição
+            try:
+                doc = self._claim(doc_id, fingerprint)
+            except Exception as err:
+                # Sem armazenamento disponível, o pedido é executado normalmente
+                logging.warning(f"Idempotency-Key ignorada, armazenamento indisponível: {err}")
+                return f(*args, **kwargs)
+            if doc is not None:
+                if doc["fingerprint"] != fingerprint:
+                    return response(key, "Idempotency-Key já usada com outro pedido", 422)
+                if doc["status"] == "processing":
+                    return response(key, "Pedido com esta Idempotency-Key ainda em curso", 409)
+                self._cache_put(doc_id, doc)
+                return self._replay(doc)
+
+            try:
+                result = make_response(f(*args, **kwargs))
+            except Exception:
+                self.collection.delete_one({"_id": doc_id})
+                raise
+
+            # Erros do servidor não são guardados: o cliente pode tentar de novo
+            if result.status_code >= 500:
+                self.collection.delete_one({"_id": doc_id})
+                return result
+
+            # Guarda o conteúdo independentemente do formato (JSON ou MessagePack);
+            # outros formatos são guardados tal como foram enviados
+            doc = {
+                "fingerprint": fingerprint,
+                "status": "done",
+                "code": result.status_code,
+                "payload": deserialize(result.get_data(), result.mimetype),
+                "body": None,
+                "mimetype": result.mimetype
+            }
+            if doc["payload"] is None:
+                doc["body"] = result.get_data()
+            try:
+                self.collection.update_one({"_id": doc_id}, {"$set": doc})
+                self._cache_put(doc_id, doc)
+            except Exception as err:
+                logging.warning(f"Falha ao guardar resposta idempotente: {err}")
+                try:
+                    self.collection.delete_one({"_id": doc_id})
+                except Exception:
+                    pass
+            return result
+        return decorated_function
@@ -0,0 +1,230 @@
+# Importações do sistema
+import atexit
+import datetime
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# Threadpool do gevent, para o listener quando o threading está monkey-patched
+from gevent import get_hub, monkey
+
+# Importações do Flask
+from flask import Flask, g, has_request_context, request
+
+# Header usado para propagar o identificador do pedido
+REQUEST_ID_HEADER = "X-Request-ID"
+# Aceita apenas IDs curtos e seguros vindos do cliente
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Intervalo mínimo entre avisos de registos descartados
+DROPPED_REPORT_INTERVAL = 10.0
+
+# Listener e handler ativos (um por processo)
+_listener: Optional["NativeQueueListener"] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registo como uma linha JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in ("request_id", "route", "method", "path", "ip"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Acrescenta os dados do pedido atual ao registo e aplica a amostragem por rota.
+    Corre na thread do pedido, antes do registo entrar na fila.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not has_request_context():
+            return True
+
+        # Registos abaixo de WARNING só passam se o pedido foi amostrado
+        if record.levelno < logging.WARNING and not g.get("log_sampled", True):
+            return False
+
+        record.request_id = g.get("request_id")
+        record.route = request.endpoint
+        record.method = request.method
+        record.path = request.path
+        record.ip = request.remote_addr
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler que nunca bloqueia o pedido.
+    Se a fila estiver cheia o registo é descartado e contabilizado; quando
+    volta a haver espaço é escrito um WARNING com o número de descartados,
+    no máximo um a cada DROPPED_REPORT_INTERVAL segundos.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._reported = 0
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        if self.dropped > self._reported and time.monotonic() - self._last_report >= DROPPED_REPORT_INTERVAL:
+            self.report_dropped()
+
+    def report_dropped(self, timeout: Optional[float] = None) -> None:
+        """Coloca na fila um WARNING com os registos descartados desde o último aviso."""
+        with self._lock:
+            pending = self.dropped - self._reported
+            if pending <= 0:
+                return
+            self._reported = self.dropped
+            self._last_report = time.monotonic()
+        warning = logging.LogRecord(
+            __name__, logging.WARNING, __file__, 0,
+            f"{pending} registos de log descartados por a fila estar cheia (total: {self.dropped})",
+            None, None
+        )
+        try:
+            if timeout:
+                self.queue.put(warning, timeout=timeout)
+            else:
+                self.queue.put_nowait(warning)
+        except queue.Full:
+            with self._lock:
+                self._reported -= pending
+
+
+class NativeQueueListener(QueueListener):
+    """
+    QueueListener cujo consumidor é sempre uma thread do sistema operativo.
+    Com o gevent monkey-patched (run.py em produção) threading.Thread criaria
+    um greenlet, e as escritas no stderr bloqueariam o hub que serve os
+    pedidos; nesse caso o consumidor corre numa thread do threadpool do hub.
+    """
+
+    _pool_result = None
+
+    def start(self) -> None:
+        if not monkey.is_module_patched("threading"):
+            super().start()
+            return
+        pool = get_hub().threadpool
+        pool.maxsize += 1  # O listener ocupa uma thread do pool até terminar
+        self._pool_result = pool.spawn(self._monitor)
+
+    def stop(self) -> None:
+        if self._pool_result is None:
+            super().stop()
+            return
+        self.enqueue_sentinel()
+        self._pool_result.wait()
+        self._pool_result = None
+
+
+def parse_route_sample_rates(value: str) -> Dict[str, float]:
+    """Converte "endpoint=taxa,endpoint=taxa" num dicionário."""
+    rates = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        endpoint, rate = item.split('=', 1)
+        rates[endpoint.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(level: str = "INFO", queue_size: int = 10000) -> NonBlockingQueueHandler:
+    """
+    Configura o pipeline de logs não bloqueante.
+    Os pedidos apenas colocam registos numa fila; uma thread em segundo plano
+    formata-os em JSON e escreve-os no stderr.
+
+    O listener é sempre uma thread real, mesmo com o gevent monkey-patched
+    (ver NativeQueueListener), para que as escritas no stderr não bloqueiem
+    o hub que serve os pedidos.
+    """
+    global _listener, _queue_handler
+
+    # Chamado de novo: termina o listener anterior e substitui o hook atexit
+    atexit.unregister(stop_logging)
+    stop_logging()
+
+    log_queue = queue.Queue(maxsize=queue_size)
+
+    # Handler final, executado pela thread do listener
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter())
+
+    # Handler usado pelas threads/greenlets dos pedidos
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level.upper())
+
+    _listener = NativeQueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    _queue_handler = queue_handler
+    atexit.register(stop_logging)
+
+    return queue_handler
+
+
+def stop_logging() -> None:
+    """Escreve os registos pendentes e o total de descartados e termina o listener."""
+    global _listener, _queue_handler
+
+    if _listener is None:
+        return
+    if _queue_handler is not None:
+        _queue_handler.report_dropped(timeout=1.0)
+    _listener.stop()
+    _listener = None
+    _queue_handler = None
+
+
+def init_request_logging(app: Flask, sample_rate: float = 1.0,
+                         route_sample_rates: Optional[Dict[str, float]] = None) -> None:
+    """
+    Regista os hooks que atribuem um ID a cada pedido e decidem a amostragem.
+    A decisão é tomada uma vez por pedido, para manter todos os seus registos juntos.
+    """
+    route_sample_rates = route_sample_rates or {}
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        g.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        rate = route_sample_rates.get(request.endpoint, sample_rate)
+        g.log_sampled = rate >= 1.0 or random.random() < rate
+
+    @app.after_request
+    def add_request_id_header(response):
+        request_id = g.get("request_id")
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
@@ -0,0 +1,123 @@
+# Importações do sistema
+import cProfile
+import glob
+import hmac
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+# Greenlets do servidor gevent
+import greenlet
+
+# Importações do Flask
+from flask import Flask, g, request
+
+# Header que ativa o profiling de um pedido (o valor tem de ser o PROFILE_TOKEN)
+PROFILE_HEADER = "X-Profile"
+
+# Só um profiler pode estar ativo de cada vez no processo
+_profiler_lock = threading.Lock()
+
+
+def _safe_label(value: str) -> str:
+    """Converte o nome da rota num nome de ficheiro seguro."""
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', value or 'unknown')
+
+
+def _trace_greenlet(profiler: cProfile.Profile, target: greenlet.greenlet):
+    """
+    Restringe o profiler a um greenlet.
+    No servidor gevent todos os pedidos partilham a mesma thread e, com o
+    monkey patching do run.py, o greenlet do pedido cede o controlo enquanto
+    espera por I/O; o profiler é desligado nesse momento e religado quando
+    volta a executar, para não medir (nem atrasar) outros pedidos.
+    Retorna o tracer anterior, a repor no fim.
+    """
+    previous = greenlet.gettrace()
+
+    def tracer(event, args):
+        if event in ('switch', 'throw'):
+            origin, destination = args
+            try:
+                if origin is target:
+                    profiler.disable()
+                elif destination is target:
+                    profiler.enable()
+            except ValueError:
+                # Outra ferramenta de profiling ficou ativa entretanto
+                pass
+        if previous is not None:
+            return previous(event, args)
+
+    greenlet.settrace(tracer)
+    return previous
+
+
+def init_profiling(app: Flask, token: str = "", sample_rate: float = 0.0,
+                   output_dir: str = "profiles", max_files: int = 100) -> None:
+    """
+    Ativa o profiling por pedido, a pedido.
+    Um pedido é analisado se trouxer o header X-Profile com o token de
+    administração ou se for escolhido pela taxa de amostragem.
+    O resultado é gravado em formato pstats (compatível com snakeviz,
+    flameprof, gprof2dot...) em output_dir, com o nome da rota.
+    A amostragem deixa de gravar quando output_dir tiver max_files ficheiros.
+    Sem token nem amostragem nenhum hook é registado.
+    """
+    if not token and sample_rate <= 0:
+        return
+
+    os.makedirs(output_dir, exist_ok=True)
+    # Ficheiros já existentes contam para o limite, também entre reinícios
+    written = len(glob.glob(os.path.join(output_dir, "*.prof")))
+
+    def should_profile() -> bool:
+        header = request.headers.get(PROFILE_HEADER)
+        # Compara bytes: compare_digest rejeita texto não ASCII com TypeError, e o
+        # Werkzeug entrega os headers decodificados em latin-1
+        if token and header and hmac.compare_digest(header.encode("latin-1", "replace"), token.encode("utf-8")):
+            return True
+        return sample_rate > 0 and written < max_files and random.random() < sample_rate
+
+    @app.before_request
+    def start_profiler():
+        if not should_profile():
+            return
+        # Ignora se outro pedido já estiver a ser analisado
+        if not _profiler_lock.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Outra ferramenta de profiling já está ativa
+            _profiler_lock.release()
+            return
+        g.profiler = profiler
+        g.profiler_previous_trace = _trace_greenlet(profiler, greenlet.getcurrent())
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        nonlocal written
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return
+        try:
+            greenlet.settrace(g.pop("profiler_previous_trace", None))
+            profiler.disable()
+            filename = "{}.{}.{}.prof".format(
+                _safe_label(request.endpoint),
+                time.strftime("%Y%m%d-%H%M%S"),
+                g.get("request_id", "0"),
+            )
+            path = os.path.join(output_dir, filename)
+            profiler.dump_stats(path)
+            written += 1
+            logging.info(f"Profiling do pedido gravado em {path}")
+        except Exception as err:
+            logging.warning(f"Falha ao gravar profiling: {err}")
+        finally:
+            _profiler_lock.release()
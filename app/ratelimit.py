@@ -0,0 +1,172 @@
+# Importações do sistema
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Importações da biblioteca limits (usada pelo Flask-Limiter)
+from limits.storage import MovingWindowSupport, Storage
+
+
+class SlidingWindow:
+    """
+    Contador de janela deslizante sobre um array circular de buckets.
+    Cada bucket cobre expiry/buckets segundos; o total é mantido
+    incrementalmente, pelo que consultar e registar custa O(1) amortizado.
+    """
+
+    __slots__ = ("width", "counts", "last_index", "total")
+
+    def __init__(self, expiry: int, buckets: int):
+        self.width = expiry / buckets
+        self.counts = array('I', [0]) * buckets
+        self.last_index = 0
+        self.total = 0
+
+    def rotate(self, now: float) -> int:
+        """Esvazia os buckets que saíram da janela e retorna o índice atual."""
+        index = int(now // self.width)
+        gap = index - self.last_index
+        size = len(self.counts)
+        if gap >= size:
+            for pos in range(size):
+                self.counts[pos] = 0
+            self.total = 0
+        else:
+            for step in range(1, gap + 1):
+                pos = (self.last_index + step) % size
+                self.total -= self.counts[pos]
+                self.counts[pos] = 0
+        self.last_index = index
+        return index
+
+    def window_start(self) -> float:
+        """Início do bucket mais antigo com pedidos registados."""
+        size = len(self.counts)
+        for age in range(size - 1, -1, -1):
+            index = self.last_index - age
+            if self.counts[index % size]:
+                return index * self.width
+        return self.last_index * self.width
+
+
+class SlidingWindowStorage(Storage, MovingWindowSupport):
+    """
+    Storage em memória para o Flask-Limiter com janelas deslizantes.
+    Usar com strategy="moving-window" e storage_uri="sliding://".
+
+    As regras de uma mesma chave (ex.: IP + rota) ficam num único registo,
+    consultado com um só acesso por pedido. O número de chaves é limitado
+    por max_keys; quando cheio, a chave menos usada recentemente é removida.
+    """
+
+    STORAGE_SCHEME = ["sliding"]
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False,
+                 max_keys: int = 10000, buckets: int = 10, **options):
+        self.max_keys = int(max_keys)
+        self.buckets = int(buckets)
+        # chave -> {regra -> SlidingWindow}, por ordem de utilização
+        self.records: "OrderedDict[str, Dict[str, SlidingWindow]]" = OrderedDict()
+        self.evicted = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return ValueError
+
+    @staticmethod
+    def _split_key(key: str) -> Tuple[str, str]:
+        """Separa "prefixo/ip/rota/5/1/minute" em (prefixo/ip/rota, 5/1/minute)."""
+        parts = key.rsplit('/', 3)
+        if len(parts) < 4:
+            return key, ''
+        return parts[0], '/'.join(parts[1:])
+
+    def _record(self, key: str, create: bool) -> Optional[Dict[str, SlidingWindow]]:
+        record = self.records.get(key)
+        if record is not None:
+            self.records.move_to_end(key)
+        elif create:
+            record = {}
+            self.records[key] = record
+            while len(self.records) > self.max_keys:
+                self.records.popitem(last=False)
+                self.evicted += 1
+        return record
+
+    def _window(self, key: str, expiry: Optional[int]) -> Optional[SlidingWindow]:
+        """Obtém a janela de uma regra; cria-a se for indicado o expiry."""
+        group, rule = self._split_key(key)
+        record = self._record(group, create=expiry is not None)
+        if record is None:
+            return None
+        window = record.get(rule)
+        if window is None and expiry is not None:
+            window = SlidingWindow(expiry, self.buckets)
+            record[rule] = window
+        return window
+
+    def acquire_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        with self.lock:
+            window = self._window(key, expiry)
+            index = window.rotate(time.time())
+            if window.total + amount > limit:
+                return False
+            window.counts[index % self.buckets] += amount
+            window.total += amount
+            return True
+
+    def get_moving_window(self, key: str, limit: int, expiry: int) -> Tuple[int, int]:
+        now = time.time()
+        with self.lock:
+            window = self._window(key, None)
+            if window is None:
+                return int(now), 0
+            window.rotate(now)
+            return int(window.window_start()), window.total
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        with self.lock:
+            window = self._window(key, expiry)
+            index = window.rotate(time.time())
+            window.counts[index % self.buckets] += amount
+            window.total += amount
+            return window.total
+
+    def get(self, key: str) -> int:
+        with self.lock:
+            window = self._window(key, None)
+            if window is None:
+                return 0
+            window.rotate(time.time())
+            return window.total
+
+    def get_expiry(self, key: str) -> int:
+        now = time.time()
+        with self.lock:
+            window = self._window(key, None)
+            if window is None:
+                return int(now)
+            window.rotate(now)
+            return int(window.window_start() + window.width * self.buckets)
+
+    def check(self) -> bool:
+        return True
+
+    def reset(self) -> Optional[int]:
+        with self.lock:
+            num_items = len(self.records)
+            self.records.clear()
+            return num_items
+
+    def clear(self, key: str) -> None:
+        group, rule = self._split_key(key)
+        with self.lock:
+            record = self.records.get(group)
+            if record is not None:
+                record.pop(rule, None)
+                if not record:
+                    del self.records[group]
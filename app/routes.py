@@ -8,6 +8,7 @@ from flask import Blueprint, request
 from app.validators import validate_request
 from app.utils import (
     response, 
+    get_request_data,
     sanitize_document, 
     sanitize_email, 
     hash_password,
@@ -16,10 +17,14 @@ from app.utils import (
     record_failed_attempt,
     clear_failed_attempts
 )
-from app import limiter
+from app.stats import record_user_created, rebuild_user_stats, get_user_stats
+from app.idempotency import IdempotencyStore
+from app.audit import LoginAuditor, OUTCOME_SUCCESS, OUTCOME_FAILURE, OUTCOME_BLOCKED
+from app import limiter, admission, env_vars
 
 # Importações do MongoDB
-from pymongo.mongo_client import MongoClient
+from app.database import MongoProfiles, profiles_from_env, PROFILE_PRIMARY, PROFILE_READS
+from pymongo.errors import DuplicateKeyError
 
 # Importações para autenticação JWT
 from flask_jwt_extended import (
@@ -31,22 +36,39 @@ from flask_jwt_extended import (
 api_bp = Blueprint('api', __name__)
 
 # Configuração da conexão com o MongoDB
+# Um cliente por perfil: "primary" para escritas e login, "reads" para leituras
+# pesadas que podem ser servidas por secundários (listagens e estatísticas)
 uri = os.getenv("DATABASE_URL")
-#client = MongoClient(uri, server_api=ServerApi("1"))
-client = MongoClient(
-    uri,
-    maxPoolSize=50,
-    waitQueueTimeoutMS=2500,
-    serverSelectionTimeoutMS=5000
-)
-db = client["Cluster0"]
+mongo = MongoProfiles(uri, env_vars["MONGO_DB_NAME"], profiles_from_env(env_vars))
+db = mongo.database(PROFILE_PRIMARY)
 users_collection = db["User"]
+users_read_collection = mongo.collection("User", PROFILE_READS)
+stats_collection = db["UserStats"]  # Agregados de utilizadores por domínio e por dia
+stats_read_collection = mongo.collection("UserStats", PROFILE_READS)
+
+# Respostas guardadas por Idempotency-Key (coleção com índice TTL + cache em memória)
+idempotency = IdempotencyStore(
+    db["IdempotencyKeys"],
+    ttl=env_vars["IDEMPOTENCY_TTL"],
+    cache_size=env_vars["IDEMPOTENCY_CACHE_SIZE"],
+    lease=env_vars["IDEMPOTENCY_LEASE"]
+)
+
+# Auditoria das tentativas de login, gravada em lote em segundo plano
+login_auditor = LoginAuditor(
+    db["LoginAudit"],
+    ttl=env_vars["AUDIT_TTL_DAYS"] * 86400,
+    batch_size=env_vars["AUDIT_BATCH_SIZE"],
+    flush_interval=env_vars["AUDIT_FLUSH_INTERVAL_MS"] / 1000,
+    max_queue=env_vars["AUDIT_QUEUE_SIZE"]
+)
 
 
 # Rotas
 # Rota para verificar o status da API e conexão com o banco de dados
 @api_bp.route("/", methods=["GET"])
 @limiter.limit("10 per minute")  # Limite de 10 requisições por minuto para status check
+@admission.limit("read")
 def status():
     logging.info("route '/' status()")
     try:
@@ -60,32 +82,39 @@ def status():
 # Só pode ser usado uma vez quando não existem usuários no sistema
 @api_bp.route("/createsuperuser", methods=["POST"])
 @limiter.limit("3 per day")  # Limite mais restrito para criação de superusuário
+@idempotency.idempotent  # Repetições com a mesma Idempotency-Key devolvem a resposta guardada
+@admission.limit("auth")
 @validate_request('registration')
 def createsuperuser():
     logging.info("route '/createsuperuser' createsuperuser()")
-    new_user = request.get_json()  # Armazena o corpo da requisição JSON
+    new_user = get_request_data()  # Armazena o corpo da requisição (JSON ou MessagePack)
     try:
         one = users_collection.count_documents({})
-        print("Quantos existem?", one)
+        logging.info(f"Utilizadores existentes: {one}")
         if one == 0:
             # Sanitização da entrada
             new_user = sanitize_document(new_user)
             new_user["email"] = sanitize_email(new_user["email"])
             # Hash da palavra-passe
             new_user["password"] = hash_password(new_user["password"])
+            new_user["created_at"] = datetime.datetime.now(datetime.timezone.utc)
             users_collection.insert_one(new_user)
-            print(new_user)
-            del new_user["_id"]
+            record_user_created(stats_collection, new_user["email"], new_user["created_at"])
+            logging.info(f"Superutilizador criado: {new_user['email']}")
+            # A resposta não inclui o hash da palavra-passe (também é guardada por Idempotency-Key)
+            del new_user["_id"], new_user["password"]
             return response(new_user, "Utilizador criado com sucesso", 201)
         else:
-            return response(new_user, "Já existem utilizadores", 409)
-    except Exception as err:
+            return response(new_user["email"], "Já existem utilizadores", 409)
+    except DuplicateKeyError as err:
+        # Outros erros (ex.: MongoDB indisponível) são 500, para não serem guardados por Idempotency-Key
         return response(err, "Nome de utilizador já existe", 409)
 
 # Rota para autenticação de utilizadores
 # Retorna um token JWT válido por 7 minutos se as credenciais estiverem corretas
 @api_bp.route("/login", methods=["POST"])
 @limiter.limit("5 per minute, 20 per hour")  # Limite rigoroso para tentativas de login
+@admission.limit("auth")
 @validate_request('login')
 def login():
     logging.info("route '/login' login()")
@@ -94,13 +123,14 @@ def login():
     ip = request.remote_addr
     is_blocked, remaining_time = is_ip_blocked(ip)
     if is_blocked:
+        login_auditor.record(ip, sanitize_email(get_request_data().get("email", "")), OUTCOME_BLOCKED)
         return response(
             {"blocked_for": remaining_time},
             f"Demasiadas tentativas falhadas. Tente novamente em {remaining_time} segundos",
             429
         )
     
-    login_details = request.get_json()
+    login_details = get_request_data()
     # Sanitização da entrada
     login_details = sanitize_document(login_details)
     email = sanitize_email(login_details["email"])
@@ -110,6 +140,7 @@ def login():
         if verify_password(login_details["password"], user_from_db["password"]):
             # Limpa as tentativas falhadas após login bem-sucedido
             clear_failed_attempts(ip)
+            login_auditor.record(ip, email, OUTCOME_SUCCESS)
             access_token = create_access_token(
                 identity=user_from_db["email"],
                 expires_delta=datetime.timedelta(minutes=7),
@@ -120,6 +151,7 @@ def login():
     
     # Regista a tentativa falhada
     record_failed_attempt(ip)
+    login_auditor.record(ip, email, OUTCOME_FAILURE)
     return response(login_details, "Email ou palavra-passe incorretos", 401)
 
 # Rota para cadastrar novos utilizadores
@@ -127,10 +159,12 @@ def login():
 @api_bp.route("/cadastro", methods=["POST"])
 @jwt_required()
 @limiter.limit("20 per hour")  # Limite para criação de novos usuários
+@idempotency.idempotent  # Repetições com a mesma Idempotency-Key devolvem a resposta guardada
+@admission.limit("auth")
 @validate_request('registration')
 def cadastro():
     logging.info("route '/cadastro' cadastro()")
-    new_user = request.get_json()  # Armazena o corpo da requisição JSON
+    new_user = get_request_data()  # Armazena o corpo da requisição (JSON ou MessagePack)
     # Sanitização da entrada
     new_user = sanitize_document(new_user)
     new_user["email"] = sanitize_email(new_user["email"])
@@ -139,8 +173,11 @@ def cadastro():
     
     doc = users_collection.find_one({"email": new_user["email"]})  # Verifica se o utilizador existe
     if not doc:
+        new_user["created_at"] = datetime.datetime.now(datetime.timezone.utc)
         users_collection.insert_one(new_user)
-        del new_user["_id"]
+        record_user_created(stats_collection, new_user["email"], new_user["created_at"])
+        # A resposta não inclui o hash da palavra-passe (também é guardada por Idempotency-Key)
+        del new_user["_id"], new_user["password"]
         return response(new_user, "Utilizador criado com sucesso", 201)
     else:
         return response(new_user["email"], "Email já existe", 409)
@@ -152,9 +189,10 @@ def cadastro():
 @api_bp.route("/cadastros", methods=["GET"])
 @jwt_required()
 @limiter.limit("30 per minute")  # Limite para listagem de usuários
+@admission.limit("read")
 def cadastros():
     logging.info("route '/cadastros' cadastros()")
-    user_from_db = users_collection.find()
+    user_from_db = users_read_collection.find()
     myList = []
     if user_from_db:
         for user in user_from_db:
@@ -165,6 +203,38 @@ def cadastros():
         return response(user_from_db, "Utilizadores não encontrados", 404)
     
 
+# Rota para obter estatísticas de utilizadores (por domínio de email e por dia)
+# Requer autenticação JWT (token válido)
+# Lê apenas a coleção de agregados, sem percorrer os utilizadores
+@api_bp.route("/stats", methods=["GET"])
+@jwt_required()
+@limiter.limit("30 per minute")  # Limite para consulta de estatísticas
+@admission.limit("read")
+def stats():
+    logging.info("route '/stats' stats()")
+    try:
+        return response(get_user_stats(stats_read_collection), "Estatísticas obtidas com sucesso", 200)
+    except Exception as err:
+        return response(str(err), "Erro ao obter estatísticas", 500)
+
+
+# Rota para recalcular as estatísticas a partir da coleção de utilizadores
+# Requer autenticação JWT (token válido)
+# Usado para preencher os agregados de utilizadores já existentes
+@api_bp.route("/stats/rebuild", methods=["POST"])
+@jwt_required()
+@limiter.limit("3 per hour")  # Limite rigoroso: percorre todos os utilizadores
+@admission.limit("read")
+def stats_rebuild():
+    logging.info("route '/stats/rebuild' stats_rebuild()")
+    try:
+        removed = rebuild_user_stats(users_collection, stats_collection)
+        return response(get_user_stats(stats_collection) | {"removed_buckets": removed},
+                        "Estatísticas recalculadas com sucesso", 200)
+    except Exception as err:
+        return response(str(err), "Erro ao recalcular estatísticas", 500)
+    
+
 # Tratamento de erro para limite de requisições
 @api_bp.errorhandler(429)
 def ratelimit_handler(e):
@@ -0,0 +1,131 @@
+# Importações do sistema
+import datetime
+import logging
+from typing import Any, Dict
+
+# Importações do MongoDB
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+
+# Tipos de agregado mantidos na coleção de estatísticas
+KIND_DOMAIN = "domain"  # Utilizadores por domínio de email
+KIND_DAY = "day"        # Utilizadores por dia de registo (UTC)
+
+
+def _domain_of(email: str) -> str:
+    return email.rsplit('@', 1)[-1]
+
+
+def record_user_created(stats_collection: Collection, email: str, created_at: datetime.datetime) -> None:
+    """
+    Atualiza incrementalmente os agregados após a criação de um utilizador.
+    Uma falha aqui não deve impedir o registo: é apenas registada em log
+    e corrigida no próximo rebuild_user_stats().
+    """
+    buckets = [
+        (KIND_DOMAIN, _domain_of(email)),
+        (KIND_DAY, created_at.strftime("%Y-%m-%d")),
+    ]
+    updated_at = datetime.datetime.now(datetime.timezone.utc)
+    try:
+        stats_collection.bulk_write([
+            UpdateOne(
+                {"_id": f"{kind}:{key}"},
+                {
+                    "$inc": {"count": 1},
+                    "$set": {"updated_at": updated_at},  # Protege o agregado durante um rebuild
+                    "$setOnInsert": {"kind": kind, "key": key}
+                },
+                upsert=True
+            )
+            for kind, key in buckets
+        ], ordered=False)
+    except Exception as err:
+        logging.warning(f"Falha ao atualizar estatísticas de utilizadores: {err}")
+
+
+def rebuild_user_stats(users_collection: Collection, stats_collection: Collection) -> int:
+    """
+    Recalcula todos os agregados a partir da coleção de utilizadores com $merge.
+    Utilizadores sem created_at usam a data de criação do seu ObjectId.
+    Retorna o número de agregados removidos por já não terem utilizadores.
+
+    Registos feitos durante o rebuild podem ou não ter sido lidos pelo $group.
+    Nos agregados incrementados depois do início (updated_at recente) fica o
+    maior dos dois valores, para não perder esses incrementos; nesses
+    agregados um desvio anterior só é corrigido num rebuild sem registos
+    em simultâneo. Os agregados criados durante o rebuild nunca são removidos.
+    """
+    rebuilt_at = datetime.datetime.now(datetime.timezone.utc)
+    merge = {"$merge": {
+        "into": stats_collection.name,
+        "on": "_id",
+        "whenMatched": [{"$set": {
+            "kind": "$$new.kind",
+            "key": "$$new.key",
+            "count": {"$cond": [
+                {"$gte": ["$updated_at", {"$literal": rebuilt_at}]},
+                {"$max": ["$count", "$$new.count"]},
+                "$$new.count"
+            ]},
+            "rebuilt_at": "$$new.rebuilt_at"
+        }}],
+        "whenNotMatched": "insert"
+    }}
+
+    def bucket(kind: str) -> Dict[str, Any]:
+        return {"$project": {
+            "_id": {"$concat": [f"{kind}:", "$_id"]},
+            "kind": {"$literal": kind},
+            "key": "$_id",
+            "count": 1,
+            "rebuilt_at": {"$literal": rebuilt_at}
+        }}
+
+    users_collection.aggregate([
+        {"$group": {
+            "_id": {"$arrayElemAt": [{"$split": ["$email", "@"]}, -1]},
+            "count": {"$sum": 1}
+        }},
+        bucket(KIND_DOMAIN),
+        merge
+    ])
+    users_collection.aggregate([
+        {"$group": {
+            "_id": {"$dateToString": {
+                "format": "%Y-%m-%d",
+                "date": {"$ifNull": ["$created_at", {"$toDate": "$_id"}]}
+            }},
+            "count": {"$sum": 1}
+        }},
+        bucket(KIND_DAY),
+        merge
+    ])
+
+    # Remove agregados que não foram reescritos (ex.: domínios sem utilizadores),
+    # exceto os incrementados depois do início do rebuild
+    result = stats_collection.delete_many({
+        "rebuilt_at": {"$ne": rebuilt_at},
+        "$or": [
+            {"updated_at": {"$exists": False}},
+            {"updated_at": {"$lt": rebuilt_at}}
+        ]
+    })
+    return result.deleted_count
+
+
+def get_user_stats(stats_collection: Collection) -> Dict[str, Any]:
+    """Lê os agregados; o custo depende do número de agregados, não de utilizadores."""
+    by_domain: Dict[str, int] = {}
+    by_day: Dict[str, int] = {}
+    for doc in stats_collection.find({}, {"_id": 0, "kind": 1, "key": 1, "count": 1}):
+        if doc["kind"] == KIND_DOMAIN:
+            by_domain[doc["key"]] = doc["count"]
+        elif doc["kind"] == KIND_DAY:
+            by_day[doc["key"]] = doc["count"]
+
+    return {
+        "total": sum(by_domain.values()),
+        "by_domain": dict(sorted(by_domain.items(), key=lambda item: item[1], reverse=True)),
+        "by_day": dict(sorted(by_day.items())),
+    }
@@ -32,6 +32,13 @@ template = {
                 "summary": "Cria o primeiro usuário administrador",
                 "description": "Cria o superusuário apenas se não existir nenhum usuário no sistema",
                 "parameters": [
+                    {
+                        "name": "Idempotency-Key",
+                        "in": "header",
+                        "type": "string",
+                        "required": False,
+                        "description": "Chave única do pedido. Repetições com a mesma chave devolvem a primeira resposta"
+                    },
                     {
                         "name": "body",
                         "in": "body",
@@ -130,6 +137,13 @@ template = {
                         "required": True,
                         "description": "Bearer {token}"
                     },
+                    {
+                        "name": "Idempotency-Key",
+                        "in": "header",
+                        "type": "string",
+                        "required": False,
+                        "description": "Chave única do pedido. Repetições com a mesma chave devolvem a primeira resposta"
+                    },
                     {
                         "name": "body",
                         "in": "body",
@@ -190,6 +204,54 @@ template = {
                     }
                 }
             }
+        },
+        "/stats": {
+            "get": {
+                "tags": ["Estatísticas"],
+                "summary": "Estatísticas de usuários",
+                "description": "Total de usuários, por domínio de email e por dia de registo. Requer autenticação JWT",
+                "parameters": [
+                    {
+                        "name": "Authorization",
+                        "in": "header",
+                        "type": "string",
+                        "required": True,
+                        "description": "Bearer {token}"
+                    }
+                ],
+                "responses": {
+                    "200": {
+                        "description": "Estatísticas retornadas com sucesso"
+                    },
+                    "500": {
+                        "description": "Erro ao obter estatísticas"
+                    }
+                }
+            }
+        },
+        "/stats/rebuild": {
+            "post": {
+                "tags": ["Estatísticas"],
+                "summary": "Recalcula as estatísticas de usuários",
+                "description": "Recalcula todos os agregados a partir dos usuários existentes. Requer autenticação JWT",
+                "parameters": [
+                    {
+                        "name": "Authorization",
+                        "in": "header",
+                        "type": "string",
+                        "required": True,
+                        "description": "Bearer {token}"
+                    }
+                ],
+                "responses": {
+                    "200": {
+                        "description": "Estatísticas recalculadas com sucesso"
+                    },
+                    "500": {
+                        "description": "Erro ao recalcular estatísticas"
+                    }
+                }
+            }
         }
     }
 }
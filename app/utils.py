@@ -3,7 +3,8 @@ import re
 import html
 import bcrypt
 import logging
-from flask import jsonify
+import msgpack
+from flask import current_app, g, has_request_context, jsonify, request
 from typing import Any, Dict, Tuple
 from collections import defaultdict
 import time
@@ -15,6 +16,14 @@ MAX_ATTEMPTS = 3   # Número máximo de tentativas antes do bloqueio
 CLEANUP_INTERVAL = 300  # Limpa tentativas antigas a cada 5 minutos
 last_cleanup = time.time()
 
+# Formatos MessagePack aceites (pedidos) e usado nas respostas
+MSGPACK_MIMETYPE = "application/msgpack"
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, "application/x-msgpack")
+
+# Nomes usados no formato de data HTTP (fixos, não dependem do locale)
+HTTP_DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+HTTP_MONTHS = (None, "Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
 def sanitize_input(value: str) -> str:
     """Sanitiza qualquer string de entrada para prevenir ataques XSS e de injeção."""
     if not isinstance(value, str):
@@ -137,11 +146,77 @@ def clear_failed_attempts(ip: str):
         del failed_attempts[ip]
         logging.info(f"Tentativas de login resetadas para IP após sucesso: {ip}")
 
+def _http_date(value: datetime.datetime) -> str:
+    """
+    Formata a data como werkzeug.http.http_date (o formato do JSON do Flask).
+    Datas sem fuso horário são consideradas UTC.
+    """
+    if value.tzinfo is not None and value.utcoffset():
+        value = value.astimezone(datetime.timezone.utc)
+    return "%s, %02d %s %04d %02d:%02d:%02d GMT" % (
+        HTTP_DAYS[value.weekday()], value.day, HTTP_MONTHS[value.month], value.year,
+        value.hour, value.minute, value.second
+    )
+
+def _msgpack_default(obj: Any) -> Any:
+    """
+    Converte tipos sem representação MessagePack.
+    Usa as mesmas conversões do JSON do Flask (ex.: datas em formato HTTP),
+    para que o envelope seja igual nos dois formatos. As datas, o caso comum,
+    são formatadas diretamente: passar pelo current_app.json.default custava
+    mais do que a própria codificação MessagePack.
+    """
+    if isinstance(obj, datetime.datetime):
+        return _http_date(obj)
+    try:
+        return current_app.json.default(obj)
+    except TypeError:
+        return str(obj)
+
+def wants_msgpack() -> bool:
+    """Verifica se o cliente pediu MessagePack no header Accept."""
+    if not has_request_context():
+        return False
+    best = request.accept_mimetypes.best_match(("application/json",) + MSGPACK_MIMETYPES)
+    return best in MSGPACK_MIMETYPES
+
+def get_request_data() -> Any:
+    """
+    Lê o corpo do pedido em JSON ou, se o Content-Type o indicar, em MessagePack.
+    O resultado MessagePack é guardado para não ser descodificado duas vezes.
+    """
+    if request.mimetype not in MSGPACK_MIMETYPES:
+        return request.get_json()
+    if "msgpack_body" not in g:
+        g.msgpack_body = msgpack.unpackb(request.get_data(), raw=False)
+    return g.msgpack_body
+
+def serialize(payload: Any):
+    """Converte o payload numa resposta JSON ou MessagePack, conforme o header Accept."""
+    if wants_msgpack():
+        body = current_app.response_class(
+            msgpack.packb(payload, default=_msgpack_default),
+            mimetype=MSGPACK_MIMETYPE
+        )
+    else:
+        body = jsonify(payload)
+    body.vary.add("Accept")  # O formato depende do header Accept
+    return body
+
+def deserialize(body: bytes, mimetype: str) -> Any:
+    """Lê um corpo de resposta JSON ou MessagePack; retorna None noutros formatos."""
+    if mimetype in MSGPACK_MIMETYPES:
+        return msgpack.unpackb(body, raw=False)
+    if mimetype == "application/json":
+        return current_app.json.loads(body)
+    return None
+
 # Função para padronizar as respostas da API
 # Parâmetros:
 #   data: dados a serem retornados na resposta
 #   message: mensagem descritiva do resultado da operação
 #   code: código HTTP da resposta (200=sucesso, 201=criado, 4xx=erro cliente, 5xx=erro servidor)
+# A resposta é JSON, ou MessagePack se o cliente enviar "Accept: application/msgpack"
 def response(data, message, code):
     # Define o status de sucesso baseado no código HTTP
     code_text = "true"
@@ -157,4 +232,4 @@ def response(data, message, code):
         "data": data,             # Dados da resposta
         "date": datetime.datetime.timestamp(dt),  # Timestamp da resposta
     }
-    return jsonify(text), code  # Retorna o JSON formatado com o código HTTP
+    return serialize(text), code  # Retorna a resposta formatada com o código HTTP
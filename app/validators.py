@@ -1,5 +1,5 @@
 from functools import wraps
-from flask import request, jsonify
+from app.utils import get_request_data, serialize
 
 class ValidateError(Exception):
     pass
@@ -67,24 +67,26 @@ def validate_request(validation_type):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
+            # Só a leitura e a validação do corpo dão 400; os erros da rota
+            # (ex.: MongoDB indisponível) seguem para o handler de erros 500
             try:
-                data = request.get_json()
+                data = get_request_data()  # JSON ou MessagePack
                 if validation_type == 'registration':
                     user_validator.validate_registration(data)
                 elif validation_type == 'login':
                     user_validator.validate_login(data)
-                return f(*args, **kwargs)
             except ValidateError as e:
-                return jsonify({
+                return serialize({
                     'status': 'error',
                     'message': 'A validação falhou',
                     'errors': e.args[0]
                 }), 400
             except Exception as e:
-                return jsonify({
+                return serialize({
                     'status': 'error',
                     'message': 'Dados do pedido inválidos',
                     'error': str(e)
                 }), 400
+            return f(*args, **kwargs)
         return decorated_function
     return decorator
@@ -0,0 +1,60 @@
+"""
+Compara JSON e MessagePack na resposta de /cadastros.
+
+Gera uma lista de utilizadores semelhante à devolvida pela rota, formata-a
+com utils.response() em cada formato e mede o tamanho do payload e o tempo
+de codificação (servidor) e de descodificação (cliente).
+O JSON é sempre compacto, como em produção (com DEBUG=true o Flask
+indentaria o JSON e a comparação deixaria de ser justa).
+
+Requer o mesmo .env que o servidor. Execução:
+    python -m benchmarks.response_formats [número_de_utilizadores] [repetições]
+"""
+# Importações do sistema
+import datetime
+import json
+import sys
+import timeit
+
+import msgpack
+
+from app import api
+from app.utils import MSGPACK_MIMETYPE, response
+
+
+def build_users(count: int):
+    """Cria utilizadores com os campos devolvidos por /cadastros."""
+    created_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            "email": f"utilizador{i}@dominio{i % 50}.pt",
+            "name": f"Utilizador Número {i}",
+            "created_at": created_at + datetime.timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def run(count: int = 1000, repeat: int = 200):
+    # JSON compacto, independentemente do DEBUG do .env
+    api.json.compact = True
+    users = build_users(count)
+    formats = {"json": "application/json", "msgpack": MSGPACK_MIMETYPE}
+    decoders = {"json": json.loads, "msgpack": lambda data: msgpack.unpackb(data, raw=False)}
+
+    print(f"{count} utilizadores, {repeat} repetições")
+    print(f"{'formato':<10}{'bytes':>10}{'codificar (ms)':>18}{'descodificar (ms)':>20}")
+    for name, mimetype in formats.items():
+        with api.test_request_context("/api/v1/cadastros", headers={"Accept": mimetype}):
+            def encode():
+                body, _ = response(users, "Utilizadores obtidos com sucesso", 200)
+                return body.get_data()
+
+            payload = encode()
+            encode_ms = timeit.timeit(encode, number=repeat) / repeat * 1000
+        decode_ms = timeit.timeit(lambda: decoders[name](payload), number=repeat) / repeat * 1000
+        print(f"{name:<10}{len(payload):>10}{encode_ms:>18.3f}{decode_ms:>20.3f}")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
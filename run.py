@@ -1,21 +1,35 @@
 # Importações necessárias
-import logging  # Para registro de logs
 import os      # Para variáveis de ambiente
+from dotenv import load_dotenv
 
-# Importações da aplicação e servidores
-from app import api, CustomRequestHandler  # Importa a aplicação Flask e o handler customizado
-from gevent.pywsgi import WSGIServer  # Servidor WSGI para produção
-
+load_dotenv(override=True)
 DEBUG = bool(os.getenv("DEBUG") == "true")
 
+# Em produção o servidor gevent serve todos os pedidos numa só thread. Sem o
+# monkey patching, o I/O do pymongo e os time.sleep bloqueiam o hub até a rota
+# terminar: os pedidos seriam servidos um a um e o controlo de admissão nunca
+# teria pedidos concorrentes para limitar. Tem de ser feito antes de qualquer
+# outra importação.
+if not DEBUG:
+    from gevent import monkey
+    monkey.patch_all()
+
+import logging  # noqa: E402 - Para registro de logs
+import signal  # noqa: E402 - Para terminar de forma ordenada com SIGTERM
+import sys  # noqa: E402
+
+# Importações da aplicação e servidores
+from app import api, env_vars, CustomRequestHandler  # noqa: E402 - Aplicação Flask e handler customizado
+from app.logger import setup_logging  # noqa: E402 - Pipeline de logs não bloqueante
+import gevent  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402 - Servidor WSGI para produção
+
 if __name__ == "__main__":
     # Configuração do sistema de logs
-    # Formato: Data/Hora - Nível - Mensagem
-    logging.basicConfig(
-        format="{asctime} - {levelname} - {message}",
-        style="{",
-        datefmt="%Y-%m-%d %H:%M",
-        level=logging.INFO,  # Nível de log definido como INFO
+    # Os pedidos apenas colocam registos numa fila; uma thread escreve-os em JSON
+    setup_logging(
+        level=env_vars["LOG_LEVEL"],
+        queue_size=env_vars["LOG_QUEUE_SIZE"],
     )
     
     logging.info("Iniciando a aplicação...")
@@ -31,10 +45,17 @@ if __name__ == "__main__":
     server_info = f"Servidor API: http://{host}:{port}/api/v1/\nDocumentação: http://{host}:{port}/api/docs/"
     logging.info(server_info)
     
+    # SIGTERM (docker stop, systemd...) termina o processo normalmente, para que
+    # os hooks atexit corram: gravação da auditoria de login e da fila de logs
     if DEBUG:
         # Modo desenvolvimento: usa o servidor de desenvolvimento do Flask
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
         api.run(host=host, port=port, debug=DEBUG, request_handler=CustomRequestHandler)
     else:
         # Modo produção: usa o servidor WSGI (gevent)
-        server = WSGIServer((host, port), api, handler_class=CustomRequestHandler)
+        # O CustomRequestHandler é do servidor do Werkzeug e não funciona no gevent,
+        # que de qualquer forma não envia o header Server
+        server = WSGIServer((host, port), api)
+        gevent.signal_handler(signal.SIGTERM, server.stop)
         server.serve_forever()
+        logging.info("Servidor terminado")